@@ -6,22 +6,25 @@ Provides functions to format and post email content as threaded posts to Bluesky
 
 Features:
     - Authenticates and posts to Bluesky using provided handle and password
+    - Persists Bluesky sessions on disk so later runs can skip the password login
     - Formats email content for posting, including sender, subject, date, and body
     - Splits long content into chunks and posts as a threaded conversation
     - Handles errors and logs actions to both console and rotating log file
 
 Usage:
-    Import and call post_to_bluesky(handle, password, sender, subject, date, body)
+    Import and call create_client(handle, password) once per handle, then
+    post_to_bluesky(client, sender, subject, body, date=date) for each email.
     Returns the number of posts made (0 on failure).
 
 Required Arguments:
-    handle (str): Bluesky account handle
-    password (str): Bluesky account password
+    client (Client): Authenticated Bluesky client from create_client
     sender (str): Email sender
     subject (str): Email subject
-    date (str): Email sent date
     body (str): Email body text
 
+Optional Arguments:
+    date (str): Email sent date, omitted from the post when not given
+
 Dependencies:
     - Python 3.11+
     - atproto
@@ -29,63 +32,217 @@ Dependencies:
 
 Notes:
     - Designed to be called from the main bot script after extracting email content.
-    - Uses a 5-second delay between posts to avoid rate limits.
+    - Paces posts with a per-handle sliding window limiter and retries with backoff when
+      Bluesky responds with HTTP 429, instead of sleeping a fixed time between posts.
 
 Author: Randy Weaver
 License: MIT
 """
-from atproto import Client, models
+from atproto import Client, SessionEvent, exceptions, models
+from collections import deque
+import os
 import re
 import time
 import logging
 logger = logging.getLogger(__name__)
 
-def post_to_bluesky(handle: str, password: str, sender: str, subject: str, date: str, body: str) -> int:
+# Client-side posting budget per handle, well under Bluesky's createRecord limits
+POSTS_PER_WINDOW = 100
+RATE_LIMIT_WINDOW = 300  # seconds
+# Exported session string for each handle, reused across runs
+SESSION_FILE = '.bsky_session_{handle}.txt'
+# Retry policy for posts rejected with HTTP 429 (Too Many Requests)
+MAX_RETRIES = 5
+MAX_BACKOFF = 60  # seconds
+
+# Invisible characters that should not keep an otherwise blank line alive
+INVISIBLE_CHARS = dict.fromkeys(map(ord, '\u200b\u200c\u200d\ufeff\u00ad\u034f'))
+EXCESS_NEWLINES_RE = re.compile(r'\n{3,}')
+
+def post_to_bluesky(client: Client, sender: str, subject: str, body: str, date: str | None = None) -> int:
     """Format and post email content as a threaded conversation to Bluesky.
 
-    Authenticates with Bluesky using the provided handle and password, formats the email
-    content, and posts it as a thread (splitting into multiple posts if needed).
+    Formats the email content and posts it as a thread (splitting into multiple posts if
+    needed) using an already authenticated client, so one login can serve many emails.
 
     Args:
-        handle (str): Bluesky account handle.
-        password (str): Bluesky account password.
+        client (Client): Authenticated Bluesky API client, see create_client.
         sender (str): Email sender address.
         subject (str): Email subject line.
-        date (str): Email sent date/time.
         body (str): Email body text.
+        date (str, optional): Email sent date/time. The 'Sent:' line is left out if not given.
 
     Returns:
         int: Number of posts made (0 on failure).
 
     Raises:
-        Exception: If client initialization, login, formatting, or posting fails.
+        Exception: If formatting or posting fails.
     """
     logger = logging.getLogger(__name__)
     try:
-        client = Client()
-        client.login(handle, password)
-    except Exception as e:
-        logger.error(f"Failed to initialize or login Bluesky client for {handle}: {e}")
-        raise
-    try:
-        post_text = f"📧 From: {sender}\nSubject: {subject}\nSent: {date}\n{body}"
-        post_text = re.sub(r'^[ \t]+', '', post_text, flags=re.MULTILINE)  # Remove leading spaces/tabs from each line
-        # Remove lines that are only whitespace (including invisible Unicode chars)
-        post_text = re.sub(r'^[\s\u200b-\u200d\ufeff\u00ad͏‌]+$', '', post_text, flags=re.MULTILINE)
+        sent_line = f"Sent: {date}\n" if date is not None else ""
+        post_text = f"📧 From: {sender}\nSubject: {subject}\n{sent_line}{body}"
+        # Remove leading spaces/tabs from each line and empty lines that are only whitespace
+        # (including invisible Unicode chars), in a single pass over the lines
+        lines = (line.lstrip(' \t') for line in post_text.split('\n'))
+        post_text = '\n'.join(line if line.translate(INVISIBLE_CHARS).strip() else '' for line in lines)
         # Collapse 3+ newlines to 2
-        post_text = re.sub(r'\n{3,}', '\n\n', post_text)
+        post_text = EXCESS_NEWLINES_RE.sub('\n\n', post_text)
         post_text = post_text.strip()  # Remove leading/trailing whitespace
     except Exception as e:
-        logger.error(f"Failed to format post text for {handle}: {e}")
+        logger.error(f"Failed to format post text for {client.me.handle if client.me else ''}: {e}")
         raise
     return post_chunks(post_text, client)
 
+def save_session(path: str, session_string: str) -> None:
+    """Write an exported Bluesky session string to disk, readable by the owner only.
+
+    Args:
+        path (str): File to write the session to.
+        session_string (str): Session string as returned by Client.export_session_string.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)  # tighten files created before with wider permissions
+    with os.fdopen(fd, 'w') as f:
+        f.write(session_string)
+
+def create_client(handle: str, password: str) -> Client:
+    """Create a Bluesky client logged in as the given handle.
+
+    Reuses the session saved in SESSION_FILE by a previous run when possible, and falls
+    back to a password login if there is no saved session or it can no longer be used.
+    Whenever the session is created or refreshed, it is written back to SESSION_FILE.
+
+    Args:
+        handle (str): Bluesky account handle.
+        password (str): Bluesky account password.
+
+    Returns:
+        Client: Authenticated Bluesky API client.
+
+    Raises:
+        Exception: If the password login fails.
+    """
+    session_path = SESSION_FILE.format(handle=handle)
+    client = Client()
+
+    def on_session_change(event, session):
+        if event in (SessionEvent.CREATE, SessionEvent.REFRESH):
+            try:
+                save_session(session_path, session.export())
+            except OSError as e:
+                logger.warning(f"Failed to save Bluesky session for {handle}: {e}")
+
+    client.on_session_change(on_session_change)
+    if os.path.exists(session_path):
+        try:
+            with open(session_path) as f:
+                client.login(session_string=f.read())
+            return client
+        except Exception as e:
+            logger.warning(f"Saved Bluesky session for {handle} is unusable, logging in again: {e}")
+    try:
+        client.login(handle, password)
+    except Exception as e:
+        logger.error(f"Failed to initialize or login Bluesky client for {handle}: {e}")
+        raise
+    return client
+
+class SlidingWindowLimiter:
+    """Limit the number of requests made within a sliding time window.
+
+    Remembers when each of the last max_requests requests was made and, once the budget
+    for the window is used up, blocks until the oldest request falls out of the window.
+
+    Args:
+        max_requests (int): Maximum number of requests allowed per window.
+        window (float): Window length in seconds.
+    """
+
+    def __init__(self, max_requests: int, window: float):
+        self.max_requests = max_requests
+        self.window = window
+        self.timestamps = deque()
+
+    def acquire(self) -> None:
+        """Block until another request may be made, then record it."""
+        now = time.monotonic()
+        while self.timestamps and now - self.timestamps[0] >= self.window:
+            self.timestamps.popleft()
+        if len(self.timestamps) >= self.max_requests:
+            wait = self.timestamps[0] + self.window - now
+            logger.info(f"Rate limit budget used up, waiting {wait:.1f}s")
+            time.sleep(wait)
+            self.timestamps.popleft()
+        self.timestamps.append(time.monotonic())
+
+limiters: dict[str, SlidingWindowLimiter] = {}
+
+def get_retry_delay(headers: dict, default: float) -> float:
+    """Work out how long to wait before retrying a rate-limited request.
+
+    Uses the 'retry-after' header (seconds) if present, otherwise the 'ratelimit-reset'
+    header (Unix timestamp), otherwise the given default.
+
+    Args:
+        headers (dict): Response headers of the rejected request.
+        default (float): Delay to use when the headers do not say.
+
+    Returns:
+        float: Delay in seconds, capped at MAX_BACKOFF.
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    try:
+        if 'retry-after' in headers:
+            delay = float(headers['retry-after'])
+        elif 'ratelimit-reset' in headers:
+            delay = float(headers['ratelimit-reset']) - time.time()
+        else:
+            delay = default
+    except ValueError:
+        delay = default
+    return min(max(delay, 0), MAX_BACKOFF)
+
+def send_post(client, text, reply_to=None):
+    """Send a single post, respecting the rate limit for the client's handle.
+
+    Waits on the handle's SlidingWindowLimiter before each attempt. If Bluesky rejects the
+    post with HTTP 429, sleeps for the delay it asks for (or an exponential backoff) and
+    retries, up to MAX_RETRIES times.
+
+    Args:
+        client (Client): Authenticated Bluesky API client.
+        text (str): The post text.
+        reply_to (models.AppBskyFeedPost.ReplyRef, optional): Reference of the post to reply to.
+
+    Returns:
+        models.AppBskyFeedPost.CreateRecordResponse: The created post.
+
+    Raises:
+        Exception: If posting fails for any reason other than rate limiting, or keeps being
+            rate limited after MAX_RETRIES retries.
+    """
+    handle = client.me.handle if client.me else ''
+    limiter = limiters.setdefault(handle, SlidingWindowLimiter(POSTS_PER_WINDOW, RATE_LIMIT_WINDOW))
+    backoff = 1
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            return client.send_post(text=text, reply_to=reply_to)
+        except exceptions.RequestException as e:
+            if e.response is None or e.response.status_code != 429 or attempt == MAX_RETRIES:
+                raise
+            delay = get_retry_delay(e.response.headers, backoff)
+            logger.warning(f"Rate limited by Bluesky, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
 def post_chunks(post_text, client):
     """Post a long text to Bluesky as a threaded conversation.
 
     Splits the input text into chunks, posts the first chunk as the root post,
-    and replies to it with subsequent chunks to form a thread. Waits 5 seconds
-    between posts to avoid rate limits. Logs actions and errors.
+    and replies to it with subsequent chunks to form a thread. Posts are sent one after
+    another through send_post, which handles rate limiting. Logs actions and errors.
 
     Args:
         post_text (str): The full text to post.
@@ -102,14 +259,15 @@ def post_chunks(post_text, client):
         logger.error("No content to post.")
         raise ValueError("No content to post.")
     try:
-        root_post = client.send_post(text=chunks[0])
-        root_ref = models.create_strong_ref(root_post)
-        parent_ref = root_ref
+        root_post = send_post(client, chunks[0])
+        # Refs are built from trusted API responses, so skip pydantic validation and reuse
+        # a single ReplyRef, only moving its parent along the thread
+        root_ref = models.ComAtprotoRepoStrongRef.Main.model_construct(uri=root_post.uri, cid=root_post.cid)
+        reply_to = models.AppBskyFeedPost.ReplyRef.model_construct(parent=root_ref, root=root_ref)
         for chunk in chunks[1:]:
-            time.sleep(5) # wait 5 seconds between posts
-            reply_to = models.AppBskyFeedPost.ReplyRef(parent=parent_ref, root=root_ref)
-            parent_post = client.send_post(text=chunk, reply_to=reply_to)
-            parent_ref = models.create_strong_ref(parent_post)
+            parent_post = send_post(client, chunk, reply_to)
+            reply_to.parent = models.ComAtprotoRepoStrongRef.Main.model_construct(
+                uri=parent_post.uri, cid=parent_post.cid)
         logger.info(f"✓ Posted thread with {len(chunks)} parts.")
         return len(chunks)
     except Exception as e:
@@ -131,16 +289,14 @@ def split_text(full_text, max_chunk=300) -> list[str]:
     """
     chunks = []
     start = 0
-    while start < len(full_text):
-        # Get a chunk
+    text_len = len(full_text)
+    while start < text_len:
         end = start + max_chunk
-        chunk = full_text[start:end]
-        # Try to break at word boundary
-        if end < len(full_text):
-            last_space = chunk.rfind(' ') + 1
-            if last_space > max_chunk - 50:
-                end = start + last_space
-                chunk = full_text[start:end]
-        chunks.append(chunk.strip())
+        # Try to break at word boundary, searching the window in place instead of slicing it first
+        if end < text_len:
+            last_space = full_text.rfind(' ', start, end)
+            if last_space != -1 and last_space - start + 1 > max_chunk - 50:
+                end = last_space + 1
+        chunks.append(full_text[start:end].strip())
         start = end
     return chunks
@@ -31,38 +31,35 @@ Dependencies:
     - google-api-python-client
     - google-auth-httplib2
     - google-auth-oauthlib
-    - html2text
+    - selectolax
+    - pybase64
 
 External Files:
     - credentials.json: Gmail API OAuth2 credentials
-    - token.pickle: Gmail API OAuth2 token (auto-generated)
+    - token.json: Gmail API OAuth2 token (auto-generated)
 
 Author: Randy Weaver
 License: MIT
 """
-import base64
-import html2text
+import asyncio
+import itertools
+from collections.abc import Iterable
+from email.utils import getaddresses
 import os
-import pickle
-import re
 import logging
 from logging.handlers import RotatingFileHandler
-from bluesky_post import post_to_bluesky
+import pybase64
+from selectolax.parser import HTMLParser
+from bluesky_post import create_client, post_to_bluesky
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.http import build_http
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-# Configure logging to both console and rotating file
 LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
 LOG_FILE = 'bot.log'
 
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=1024*1024, backupCount=3)
-file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-
-logging.basicConfig(level=logging.INFO, handlers=[console_handler, file_handler])
-
 # Load email config from environment variables
 EMAIL_USERNAME = os.getenv('EMAIL_USERNAME')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
@@ -70,199 +67,486 @@ EMAIL_SERVER = os.getenv('EMAIL_SERVER')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
+LIST_PAGE_SIZE = 500  # maximum number of messages returned per messages.list page
+BATCH_GET_LIMIT = 50  # calls per batch request; Gmail allows 100 but recommends at most 50
+BATCH_MODIFY_LIMIT = 1000  # maximum number of message IDs accepted by messages.batchModify
+
+# Elements dropped entirely (with their content) before HTML-to-text conversion
+NON_TEXT_TAGS = ['head', 'style', 'script', 'img']
+# Inline elements unwrapped so their text stays on the same line as the surrounding text
+INLINE_TAGS = ['a', 'abbr', 'b', 'big', 'cite', 'code', 'em', 'font', 'i', 'mark', 'q',
+               's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'time', 'tt', 'u']
+
+def normalize_address(address: str) -> str:
+    """Normalize an email address for alias lookups.
+
+    Strips surrounding whitespace and lower-cases the address, since mail providers treat
+    addresses case-insensitively in practice.
+
+    Args:
+        address (str): The email address to normalize.
+
+    Returns:
+        str: The normalized address.
+    """
+    return address.strip().lower()
+
+def parse_alias_mapping(value: str):
+    """Parse a single alias mapping in the format 'email_alias|bluesky_handle|bluesky_password'.
+
+    Args:
+        value (str): The value of an ALIAS_* environment variable.
+
+    Returns:
+        tuple | None: The email alias (str) and a dict with 'handle' and 'password' keys, or
+        None if the value does not have exactly three '|'-separated fields.
+    """
+    email_alias, sep, rest = value.partition('|')
+    bluesky_handle, sep2, bluesky_password = rest.partition('|')
+    if not sep or not sep2 or '|' in bluesky_password:
+        return None
+    return email_alias, {"handle": bluesky_handle, "password": bluesky_password}
 
 def load_alias_mappings_from_env() -> dict:
     """Load Bluesky alias mappings from environment variables.
 
     Scans all environment variables for keys starting with 'ALIAS_' and parses their values
     in the format 'email_alias|bluesky_handle|bluesky_password'. Returns a dictionary mapping
-    each email alias to its corresponding Bluesky handle and password.
+    each email alias, normalized with normalize_address, to its corresponding Bluesky
+    handle and password. Called once at import time to populate ALIASES.
 
     Returns:
-        dict: Mapping of email alias (str) to a dict with 'handle' and 'password' keys.
+        dict: Mapping of normalized email alias (str) to a dict with 'handle' and 'password' keys.
     """
-    alias_dict = {}
-    for key, value in os.environ.items():
-        if key.startswith('ALIAS_'):
-            parts = value.split('|')
-            if len(parts) == 3:
-                email_alias, bluesky_handle, bluesky_password = parts
-                alias_dict[email_alias] = {
-                    "handle": bluesky_handle,
-                    "password": bluesky_password
-                }
-    return alias_dict
-
-def fetch_messages_by_label(service, label: str):
-    """Retrieve messages from Gmail with the specified label.
+    mappings = (parse_alias_mapping(value) for key, value in os.environ.items() if key.startswith('ALIAS_'))
+    return {normalize_address(email_alias): account for email_alias, account in filter(None, mappings)}
+
+# Alias mappings are fixed for the lifetime of the process, so parse them only once
+ALIASES = load_alias_mappings_from_env()
+
+def iter_messages_by_label(service, label: str, query: str = ''):
+    """Iterate over the messages in Gmail with the specified label.
+
+    Yields the messages of each result page as soon as it arrives and requests the next
+    page with 'list_next', so callers can start working before the listing is complete.
 
     Args:
         service: Authenticated Gmail API service instance.
         label (str): Email label to filter messages (e.g., 'INBOX').
+        query (str, optional): Gmail search query to filter messages on the server side.
+
+    Yields:
+        dict: Message metadata dictionaries.
+    """
+    messages = service.users().messages()
+    request = messages.list(userId='me', labelIds=[label], q=query, maxResults=LIST_PAGE_SIZE)
+    while request is not None:
+        response = request.execute()
+        yield from response.get('messages', [])
+        request = messages.list_next(request, response)
+
+def batch_get_messages(service, message_ids: Iterable[str], **params) -> dict:
+    """Retrieve several Gmail messages with batch requests.
+
+    Packs the 'messages.get' calls into multipart batch HTTP requests of up to
+    BATCH_GET_LIMIT calls each, instead of one round-trip per message. Each batch is sent
+    as soon as enough IDs are available, so a lazy iterable of IDs is consumed
+    incrementally. Messages that fail to fetch are logged and left out of the result.
+
+    Args:
+        service: Authenticated Gmail API service instance.
+        message_ids (Iterable[str]): IDs of the messages to retrieve.
+        **params: Extra 'messages.get' parameters (e.g. format, metadataHeaders, fields).
+
+    Returns:
+        dict: Mapping of message ID (str) to the Gmail message dictionary.
+    """
+    results = {}
+
+    def on_message(request_id, response, exception):
+        if exception is not None:
+            logging.error(f"Failed to fetch message for ID {request_id}: {exception}")
+        else:
+            results[request_id] = response
+
+    ids = iter(message_ids)
+    while chunk := list(itertools.islice(ids, BATCH_GET_LIMIT)):
+        batch = service.new_batch_http_request(callback=on_message)
+        for message_id in chunk:
+            batch.add(service.users().messages().get(userId='me', id=message_id, **params),
+                      request_id=message_id)
+        batch.execute()
+    return results
+
+def fetch_headers(service, message_ids: Iterable[str]) -> dict:
+    """Retrieve the headers needed for posting of several Gmail messages.
+
+    Uses the 'metadata' format restricted to the 'To', 'From', 'Subject' and 'Date'
+    headers, so no message bodies are downloaded and messages that are not addressed to
+    an alias can be triaged cheaply.
+
+    Args:
+        service: Authenticated Gmail API service instance.
+        message_ids (Iterable[str]): IDs of the messages to look up.
+
+    Returns:
+        dict: Mapping of message ID (str) to its headers as returned by index_headers, in
+        the order the IDs were given.
+    """
+    messages = batch_get_messages(service, message_ids, format='metadata',
+                                  metadataHeaders=['To', 'From', 'Subject', 'Date'],
+                                  fields='payload/headers')
+    return {message_id: index_headers(message) for message_id, message in messages.items()}
+
+def fetch_full_messages(service, message_ids: list[str]) -> dict:
+    """Retrieve the full content of several Gmail messages with batch requests.
+
+    Sends one batch request per BATCH_GET_LIMIT messages through batch_get_messages.
+    Only the payload fields needed to extract the body are requested; headers are
+    retrieved separately with fetch_headers.
+
+    Args:
+        service: Authenticated Gmail API service instance.
+        message_ids (list[str]): IDs of the messages to retrieve.
 
     Returns:
-        list: List of message metadata dictionaries.
+        dict: Mapping of message ID (str) to the full Gmail message dictionary.
     """
-    results = service.users().messages().list(userId='me', labelIds=[label]).execute()
-    messages = results.get('messages', [])
-    return messages
+    return batch_get_messages(service, message_ids, format='full',
+                              fields='payload(parts,body,mimeType)')
+
+def archive_messages(service, message_ids: list[str]) -> None:
+    """Archive Gmail messages by removing the 'INBOX' label with batchModify.
 
-def extract_all_text_parts(payload, recipient, parts=None):
-    """Recursively extract all text content from an email payload.
+    Sends one request per BATCH_MODIFY_LIMIT message IDs, so typically a single request.
 
-    Handles both 'text/plain' and 'text/html' MIME types, converting HTML to plain text.
+    Args:
+        service: Authenticated Gmail API service instance.
+        message_ids (list[str]): IDs of the messages to archive.
+    """
+    ids = iter(message_ids)
+    while chunk := list(itertools.islice(ids, BATCH_MODIFY_LIMIT)):
+        service.users().messages().batchModify(
+            userId='me', body={'ids': chunk, 'removeLabelIds': ['INBOX']}).execute()
+
+def extract_all_text_parts(payload, recipient):
+    """Extract all text content from an email payload.
+
+    Walks the MIME tree depth-first with an explicit stack, keeping the parts in document
+    order. Handles both 'text/plain' and 'text/html' MIME types, converting HTML to plain text.
     Removes hidden HTML blocks and replaces the recipient's email address with a placeholder.
     Returns a list of decoded text parts.
 
     Args:
         payload (dict): The email payload to process.
         recipient (str): The recipient's email address to be replaced in the text.
-        parts (list, optional): Accumulator for extracted text parts (used for recursion).
 
     Returns:
         list: List of extracted and decoded text strings.
     """
-    if parts is None:
-        parts = []
-    if 'parts' in payload:
-        for part in payload['parts']:
-            print(f"extracting {payload.get('mimeType')} payload, calling recursively...")
-            extract_all_text_parts(part, recipient, parts)
-    elif payload.get('mimeType') == 'text/plain':
-        print(f"extracting {payload.get('mimeType')} payload, returning...")
-        data = payload['body'].get('data', '')
-        if data:
-            parts.append(base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore'))
-    elif payload.get('mimeType') == 'text/html':
-        data = payload['body'].get('data', '')
-        print(f"extracting {payload.get('mimeType')} payload, returning...")
-        if data:
-            html_body = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-            html_body = remove_hidden_blocks(html_body)
-            html_body = html_body.replace(recipient, '[open mail project]')
-            h = html2text.HTML2Text()
-            h.ignore_links = True
-            h.ignore_images = True
-            h.body_width = 0
-            parts.append(h.handle(html_body))
+    parts = []
+    stack = [payload]
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)  # skip formatting log lines that would be dropped
+    while stack:
+        part = stack.pop()
+        mime_type = part.get('mimeType')
+        if 'parts' in part:
+            stack.extend(reversed(part['parts']))
+        elif mime_type == 'text/plain' or mime_type == 'text/html':
+            if debug:
+                logging.debug(f"extracting {mime_type} payload")
+            data = part['body'].get('data', '')
+            if not data:
+                continue
+            text = decode_body(data)
+            if mime_type == 'text/html':
+                text = html_to_text(text.replace(recipient, '[open mail project]'))
+            parts.append(text)
     return parts
 
+def decode_body(data: str) -> str:
+    """Decode a base64url-encoded Gmail message body to text.
+
+    Uses pybase64, whose SIMD decoder is several times faster than the standard library
+    on large HTML bodies. Invalid UTF-8 is ignored.
+
+    Args:
+        data (str): The 'data' field of a Gmail message part body.
+
+    Returns:
+        str: The decoded body text.
+    """
+    return pybase64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+
+def html_to_text(html: str) -> str:
+    """Convert an HTML document to plain text.
+
+    Drops hidden blocks and non-text elements (head, style, script, images), unwraps
+    inline elements so link and emphasis text stays inline, and returns the remaining
+    text with one line per block of text. Returns an empty string if the whole document
+    is hidden.
+
+    Args:
+        html (str): The HTML string to convert.
+
+    Returns:
+        str: The extracted plain text.
+    """
+    tree = HTMLParser(html)
+    if remove_hidden_nodes(tree):
+        return ''
+    tree.strip_tags(NON_TEXT_TAGS)
+    tree.unwrap_tags(INLINE_TAGS)
+    tree.merge_text_nodes()
+    root = tree.body or tree.root
+    if root is None:
+        return ''
+    return root.text(separator='\n', strip=True)
+
 def get_gmail_service():
     """Authenticate and return a Gmail API service instance.
 
-    Loads credentials from 'token.pickle' if available and valid, otherwise initiates
+    Loads credentials from 'token.json' if available and valid, otherwise initiates
     an OAuth flow using 'credentials.json' to obtain new credentials. Credentials are
-    refreshed or saved as needed. Returns an authenticated Gmail API service object.
+    refreshed or saved as needed, including a refresh token rotated by Google, which is
+    also logged. Returns an authenticated Gmail API service object.
 
     Returns:
         googleapiclient.discovery.Resource: Authenticated Gmail API service.
     """
     creds = None
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
+    if os.path.exists('token.json'):
+        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
+            previous_refresh_token = creds.refresh_token
             creds.refresh(Request())
+            if creds.refresh_token != previous_refresh_token:
+                # token.json is rewritten below, but copies kept elsewhere (e.g. the TOKEN_JSON secret) go stale
+                logging.warning("Gmail issued a new refresh token; update any stored copies of token.json")
         else:
             flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
             creds = flow.run_local_server(port=0)
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-    return build('gmail', 'v1', credentials=creds)
+        with open('token.json', 'w') as token:
+            token.write(creds.to_json())
+    # Use the discovery document bundled with the client library, skip probing for a
+    # discovery cache, and share one authorized connection for discovery and API calls
+    return build('gmail', 'v1', http=AuthorizedHttp(creds, http=build_http()),
+                 static_discovery=True, cache_discovery=False)
+
+def index_headers(full_message: dict) -> dict:
+    """Build a lookup table of a Gmail message's headers.
+
+    Walks the message headers once and maps each lower-cased header name to its value,
+    so individual headers can be looked up without rescanning the header list. When a
+    header appears more than once, the first occurrence wins.
+
+    Args:
+        full_message (dict): A Gmail message dictionary in 'full' or 'metadata' format.
 
-def get_recipient(full_message: dict) -> str:
-    """Extract the recipient's email address from a Gmail message.
+    Returns:
+        dict: Mapping of lower-cased header name (str) to header value (str).
+    """
+    return {header['name'].lower(): header['value'] for header in reversed(full_message['payload']['headers'])}
 
-    Searches the message headers for the 'To' field and returns its value.
-    If the 'To' header is not found, returns an empty string.
+def get_recipients(headers: dict) -> list[str]:
+    """Extract the recipients' email addresses from a message's headers.
+
+    Parses the 'To' header and returns the bare address of every recipient, without any
+    display name (e.g. 'Foo <foo@example.com>' gives 'foo@example.com').
 
     Args:
-        full_message (dict): The full Gmail message dictionary.
+        headers (dict): Message headers as returned by index_headers.
 
     Returns:
-        str: The recipient's email address, or an empty string if not found.
+        list[str]: The recipients' email addresses, empty if the header is not present.
     """
-    for header in full_message['payload']['headers']:
-        if header['name'].lower() == 'to':
-            return header['value']
+    return [address for _, address in getaddresses([headers.get('to', '')]) if address]
+
+def get_alias_recipient(headers: dict) -> str:
+    """Find the recipient of a message that is one of the configured aliases.
+
+    Checks every 'To' address against ALIASES, so mail where the alias is not the first
+    recipient is matched too.
+
+    Args:
+        headers (dict): Message headers as returned by index_headers.
+
+    Returns:
+        str: The first recipient address that maps to an alias, or an empty string if none does.
+    """
+    for address in get_recipients(headers):
+        if normalize_address(address) in ALIASES:
+            return address
     return ''
 
-def get_sender(full_message: dict) -> str:
-    """Extract the sender's email address from a Gmail message.
+def get_sender(headers: dict) -> str:
+    """Extract the sender's email address from a message's headers.
 
-    Searches the message headers for the 'From' field and returns its value.
-    If the 'From' header is not found, returns an empty string.
+    Returns the value of the 'From' header, or an empty string if it is not present.
 
     Args:
-        full_message (dict): The full Gmail message dictionary.
+        headers (dict): Message headers as returned by index_headers.
 
     Returns:
         str: The sender's email address, or an empty string if not found.
     """
-    for header in full_message['payload']['headers']:
-        if header['name'].lower() == 'from':
-            return header['value']
-    return ''
+    return headers.get('from', '')
 
-def get_subject(full_message: dict) -> str:
-    """Extract the subject line from a Gmail message.
+def get_subject(headers: dict) -> str:
+    """Extract the subject line from a message's headers.
 
-    Searches the message headers for the 'Subject' field and returns its value.
-    If the 'Subject' header is not found, returns an empty string.
+    Returns the value of the 'Subject' header, or an empty string if it is not present.
 
     Args:
-        full_message (dict): The full Gmail message dictionary.
+        headers (dict): Message headers as returned by index_headers.
 
     Returns:
         str: The subject line, or an empty string if not found.
     """
-    for header in full_message['payload']['headers']:
-        if header['name'].lower() == 'subject':
-            return header['value']
-    return ''
+    return headers.get('subject', '')
 
-def get_date(full_message: dict) -> str:
-    """Extract the date and time the email was sent from a Gmail message.
+def get_date(headers: dict) -> str:
+    """Extract the date and time the email was sent from a message's headers.
 
-    Searches the message headers for the 'Date' field and returns its value.
-    If the 'Date' header is not found, returns an empty string.
+    Returns the value of the 'Date' header, or an empty string if it is not present.
 
     Args:
-        full_message (dict): The full Gmail message dictionary.
+        headers (dict): Message headers as returned by index_headers.
 
     Returns:
         str: The date and time string, or an empty string if not found.
     """
-    for header in full_message['payload']['headers']:
-        if header['name'].lower() == 'date':
-            return header['value']
-    return ""
+    return headers.get('date', '')
 
-def remove_hidden_blocks(html: str) -> str:
-    # Remove <div> or <span> blocks with display:none or visibility:hidden
-    """Remove hidden HTML blocks from a string.
+def is_hidden_style(style: str) -> bool:
+    """Check whether an inline CSS style hides its element.
 
-    Strips out <div> and <span> elements with CSS styles 'display:none' or 'visibility:hidden'.
-    Useful for cleaning up email HTML content before text extraction.
+    Parses the declarations (later ones override earlier ones, '!important' is ignored)
+    and checks for 'display: none' or 'visibility: hidden'.
 
     Args:
-        html (str): The HTML string to clean.
+        style (str): The value of an element's 'style' attribute.
 
     Returns:
-        str: The cleaned HTML string with hidden blocks removed.
+        bool: True if the style hides the element.
     """
-    pattern = r'<(div|span)[^>]*style=["\'][^"\'>]*(display\s*:\s*none|visibility\s*:\s*hidden)[^"\'>]*["\'][^>]*>.*?</\1>'
-    cleaned_html = re.sub(pattern, '', html, flags=re.DOTALL | re.IGNORECASE)
-    return cleaned_html
+    declarations = {}
+    for declaration in style.split(';'):
+        name, _, value = declaration.partition(':')
+        declarations[name.strip().lower()] = value.partition('!')[0].strip().lower()
+    return declarations.get('display') == 'none' or declarations.get('visibility') == 'hidden'
+
+def remove_hidden_nodes(tree: HTMLParser) -> bool:
+    """Remove hidden elements from a parsed HTML tree in place.
+
+    Decomposes every element whose inline style sets 'display: none' or
+    'visibility: hidden', together with its content. The <html>, <head> and <body>
+    elements are never decomposed, since the parser keeps pointers to them; if <html> or
+    <body> itself is hidden, nothing is removed and True is returned instead.
+
+    Args:
+        tree (HTMLParser): The parsed HTML document to clean.
+
+    Returns:
+        bool: True if the whole document is hidden, False otherwise.
+    """
+    hidden = []
+    for node in tree.css('[style]'):
+        if not is_hidden_style(node.attributes.get('style') or ''):
+            continue
+        if node.tag in ('html', 'body'):
+            return True
+        if node.tag != 'head':
+            hidden.append(node)
+    # Decompose descendants before their ancestors so no node is freed twice
+    for node in reversed(hidden):
+        node.decompose()
+    return False
+
+def post_messages(handle: str, password: str, posts: list[dict]) -> list[str]:
+    """Post emails to one Bluesky account, one thread per email, in order.
+
+    Logs in once for the handle and reuses the client for every email. Failures are
+    logged per email; the email is still reported as handled so it gets archived.
+
+    Args:
+        handle (str): Bluesky account handle.
+        password (str): Bluesky account password.
+        posts (list[dict]): Emails to post, each with 'id', 'recipient', 'sender', 'subject',
+            'date' and 'body' keys.
+
+    Returns:
+        list[str]: IDs of the messages that were handled and can be archived.
+    """
+    try:
+        client = create_client(handle, password)
+    except Exception as e:
+        logging.error(f"Failed to log in to Bluesky as {handle}: {e}")
+        client = None
+    handled_ids = []
+    for post in posts:
+        num_posts = 0
+        if client is not None:
+            try:
+                num_posts = post_to_bluesky(client, post["sender"], post["subject"], post["body"],
+                                            date=post["date"] or None)
+            except Exception as e:
+                logging.error(f"Failed to post to Bluesky for {post['recipient']}: {e}")
+        if num_posts == 0:
+            logging.error("✗ Failed to post to Bluesky")
+        handled_ids.append(post["id"])
+    return handled_ids
+
+async def post_all(posts_by_account: dict) -> list[str]:
+    """Post emails to several Bluesky accounts concurrently.
+
+    Each account's emails are posted in order by post_messages in a worker thread, and the
+    accounts run in parallel, so the total time follows the busiest account rather than
+    the sum over all accounts.
+
+    Args:
+        posts_by_account (dict): Mapping of (handle, password) to the emails to post, as
+            accepted by post_messages.
+
+    Returns:
+        list[str]: IDs of the messages that were handled and can be archived.
+    """
+    results = await asyncio.gather(
+        *(asyncio.to_thread(post_messages, handle, password, posts)
+          for (handle, password), posts in posts_by_account.items()),
+        return_exceptions=True)
+    handled_ids = []
+    for (handle, _), result in zip(posts_by_account, results):
+        if isinstance(result, Exception):
+            logging.error(f"Error posting messages for {handle}: {result}")
+        else:
+            handled_ids.extend(result)
+    return handled_ids
+
+def configure_logging():
+    """Configure logging to both console and rotating file.
+
+    Called from main() rather than at import time, so importing this module (from tests,
+    a REPL or a profiler) does not open the log file.
+    """
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=1024*1024, backupCount=3)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    logging.basicConfig(level=logging.INFO, handlers=[console_handler, file_handler])
 
 def process_inbox():
     """Main processing loop for the email transparency bot.
 
-    Authenticates with Gmail, loads alias mappings, fetches inbox messages, and processes each message:
+    Authenticates with Gmail, fetches the headers of the inbox messages in batches while
+    the inbox is still being listed, then the bodies of those sent to an alias (see
+    ALIASES), and processes each message:
     - Extracts recipient, sender, subject, date, and body
-    - Posts to Bluesky if recipient matches an alias
-    - Archives processed messages
+    - Posts to Bluesky if recipient matches an alias, concurrently across Bluesky accounts
+    - Archives processed messages together in one request once all have been handled
     - Handles and logs errors at each step
     """
     try:
@@ -271,45 +555,55 @@ def process_inbox():
         logging.error(f"Failed to initialize Gmail service: {e}")
         return
 
+    if not ALIASES:
+        logging.warning("No alias mappings configured")
+        return
+
     try:
-        aliases = load_alias_mappings_from_env()
-        inbox_messages = fetch_messages_by_label(service, 'INBOX')
+        # Let Gmail drop messages that are not addressed to any alias
+        query = ' OR '.join(f'to:{alias}' for alias in ALIASES)
+        inbox_messages = iter_messages_by_label(service, 'INBOX', query)
+        message_headers = fetch_headers(service, (message['id'] for message in inbox_messages))
+        full_messages = fetch_full_messages(
+            service, [message_id for message_id, headers in message_headers.items()
+                      if get_alias_recipient(headers)])
     except Exception as e:
-        logging.error(f"Failed to fetch messages or aliases: {e}")
+        logging.error(f"Failed to fetch messages: {e}")
         return
 
-    for message in inbox_messages:
-        try:
-            full_message = service.users().messages().get(userId='me', id=message['id'], format='full').execute()
-        except Exception as e:
-            logging.error(f"Failed to fetch full message for ID {message.get('id')}: {e}")
-            continue
-
+    posts_by_account = {}  # (Bluesky handle, password) -> emails to post to that account, in inbox order
+    for message_id, headers in message_headers.items():
         try:
-            recipient: str = get_recipient(full_message)
-            if recipient in aliases:
-                handle = aliases[recipient]["handle"]
-                password = aliases[recipient]["password"]
-
-                subject: str = get_subject(full_message)
-                sender: str = get_sender(full_message)
-                date: str = get_date(full_message)
-                body = "\n".join(extract_all_text_parts(full_message['payload'], recipient))
-                try:
-                    num_posts = post_to_bluesky(handle, password, sender, subject, date, body)
-                except Exception as e:
-                    logging.error(f"Failed to post to Bluesky for {recipient}: {e}")
-                    num_posts = 0
-                if num_posts == 0:
-                    logging.error("✗ Failed to post to Bluesky")
-                try:
-                    service.users().messages().modify(userId='me', id=message['id'],body={'removeLabelIds': ['INBOX']}).execute()
-                except Exception as e:
-                    logging.error(f"Failed to archive message {message.get('id')}: {e}")
+            recipient: str = get_alias_recipient(headers)
+            if recipient:
+                alias = ALIASES[normalize_address(recipient)]
+                full_message = full_messages.get(message_id)
+                if full_message is None:
+                    continue
+                posts_by_account.setdefault((alias["handle"], alias["password"]), []).append({
+                    "id": message_id,
+                    "recipient": recipient,
+                    "subject": get_subject(headers),
+                    "sender": get_sender(headers),
+                    "date": get_date(headers),
+                    "body": "\n".join(extract_all_text_parts(full_message['payload'], recipient)),
+                })
             else:
                 logging.info("→ Skipping (no matching alias)")
         except Exception as e:
-            logging.error(f"Error processing message {message.get('id')}: {e}")
+            logging.error(f"Error processing message {message_id}: {e}")
 
-if __name__ == "__main__":
+    archive_ids: list[str] = asyncio.run(post_all(posts_by_account))
+
+    try:
+        archive_messages(service, archive_ids)
+    except Exception as e:
+        logging.error(f"Failed to archive messages {archive_ids}: {e}")
+
+def main():
+    """Entry point: set up logging and process the inbox once."""
+    configure_logging()
     process_inbox()
+
+if __name__ == "__main__":
+    main()